@@ -1,7 +1,22 @@
 import asyncio
-import httpx
+import logging
+import random
+
 from pydantic import BaseModel, Field
 
+from src.http_client import HTTP
+
+try:
+    import orjson
+    _json_dumps = orjson.dumps
+except ImportError:
+    import json
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+log = logging.getLogger(__name__)
+
 class EvaluationResponse(BaseModel):
     email: str
     task: str
@@ -16,25 +31,39 @@ async def submit_evaluation(
 ):
     """Submit evaluation with exponential backoff"""
 
-    async with httpx.AsyncClient() as client:
-        for attempt in range(max_retries):
-            try:
-                response = await client.post(
-                    evaluation_url,
-                    json=payload.model_dump(),
-                    headers={"Content-Type": "application/json"},
-                    timeout=30,
-                )
-                if response.status_code == 200:
-                    print(f"✅ Evaluation submitted successfully")
-                    return True
-                else:
-                    print(f"⚠ Evaluation returned {response.status_code}")
-            except Exception as e:
-                print(f"Evaluation submission attempt {attempt + 1} failed: {e}")
-
-            if attempt < max_retries - 1:
-                delay = 2**attempt 
-                await asyncio.sleep(delay)
+    # Serialize once; retries resend the same bytes
+    body = _json_dumps(payload.model_dump())
+    headers = {"Content-Type": "application/json"}
+
+    for attempt in range(max_retries):
+        response = None
+        try:
+            response = await HTTP.post(
+                evaluation_url,
+                content=body,
+                headers=headers,
+                timeout=30,
+            )
+            if response.status_code == 200:
+                log.info("✅ Evaluation submitted successfully")
+                return True
+            else:
+                log.warning("⚠ Evaluation returned %d", response.status_code)
+                # Client errors other than rate limiting will not succeed on retry
+                if 400 <= response.status_code < 500 and response.status_code != 429:
+                    break
+        except Exception as e:
+            log.warning("Evaluation submission attempt %d failed: %s", attempt + 1, e)
+
+        if attempt < max_retries - 1:
+            jitter = random.uniform(0, 1)
+            delay = min(30, 2**attempt) + jitter
+            if response is not None and "Retry-After" in response.headers:
+                try:
+                    # Honour the server's hint, but within the same 30s cap
+                    delay = min(30, max(0.0, float(response.headers["Retry-After"]))) + jitter
+                except ValueError:
+                    pass
+            await asyncio.sleep(delay)
 
     return False
\ No newline at end of file
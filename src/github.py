@@ -1,179 +1,304 @@
+import base64
+import os
+import re
+import shlex
+import shutil
+import signal
 import subprocess
 import asyncio
+import logging
 from pathlib import Path
-import os
+
 import httpx
 
+from src.http_client import HTTP
+
+log = logging.getLogger(__name__)
+
+# Resolve git once instead of a PATH search on every exec
+GIT = shutil.which("git") or "git"
+GIT_SH = shlex.quote(GIT)
+
+GITHUB_API = "https://api.github.com"
+PAGES_POLL_INTERVALS = (2, 3, 5, 5)
+# Round-2 clones fetch and check out only blobs up to this size; larger files
+# stay on the remote (skip-worktree) and are left out of the LLM context
+CLONE_BLOB_LIMIT = 1 << 20
+# Characters escaped in sparse-checkout (gitignore) patterns
+_SPARSE_SPECIAL = re.compile(rb"[\\*?\[ ]")
+
+
+async def _run(cmd, cwd=None, input=None, env=None, check=True) -> subprocess.CompletedProcess:
+    """Run a command (argv list, or bash string) without blocking the event loop"""
+    stdin = asyncio.subprocess.PIPE if input is not None else None
+    pipe = asyncio.subprocess.PIPE
+    # Own process group, so a cancelled bash batch takes its git children with it
+    if isinstance(cmd, str):
+        proc = await asyncio.create_subprocess_shell(
+            cmd, cwd=cwd, env=env, stdin=stdin, stdout=pipe, stderr=pipe,
+            executable="/bin/bash", start_new_session=True,
+        )
+    else:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, cwd=cwd, env=env, stdin=stdin, stdout=pipe, stderr=pipe,
+            start_new_session=True,
+        )
+    try:
+        stdout, stderr = await proc.communicate(input)
+    except asyncio.CancelledError:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        raise
+    if check and proc.returncode:
+        raise subprocess.CalledProcessError(proc.returncode, cmd, stdout, stderr)
+    return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+
+def _read_head_sha(work_dir: Path) -> str:
+    """Resolve HEAD from the .git directory without spawning `git rev-parse`"""
+    git_dir = work_dir / ".git"
+    head = (git_dir / "HEAD").read_text().strip()
+    if not head.startswith("ref: "):
+        # Detached HEAD already holds the SHA
+        return head
+    ref = head[5:]
+    try:
+        return (git_dir / ref).read_text().strip()
+    except FileNotFoundError:
+        pass
+    # Fresh clones keep their refs in packed-refs until the branch is updated
+    with open(git_dir / "packed-refs", encoding="utf-8") as f:
+        for line in f:
+            sha, _, name = line.rstrip("\n").partition(" ")
+            if name == ref:
+                return sha
+    raise RuntimeError(f"Cannot resolve {ref} in {git_dir}")
+
 class GitHubDeployer:
     """Handles GitHub repository creation and Pages deployment"""
 
     def __init__(self, username: str, token: str):
         self.username = username
         self.token = token
+        self.email = f"{username}@ds.study.iitm.ac.in"
+        # Passed as -c flags on commit instead of separate `git config` execs
+        self._identity = (
+            f"-c {shlex.quote(f'user.name={username}')}"
+            f" -c {shlex.quote(f'user.email={self.email}')}"
+        )
+        self._api_headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+        }
+        # Authenticate git over HTTPS through the environment so the token never
+        # appears in a remote URL, .git/config or a command line
+        basic = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        self._git_env = {
+            **os.environ,
+            "GIT_CONFIG_COUNT": "1",
+            "GIT_CONFIG_KEY_0": "http.https://github.com/.extraheader",
+            "GIT_CONFIG_VALUE_0": f"Authorization: Basic {basic}",
+        }
 
-    def clone_repository(self, repo_name: str, work_dir: Path) -> bool:
+    async def _gh_api(self, method: str, path: str, json=None) -> httpx.Response:
+        """Call the GitHub REST API on the shared connection pool"""
+        response = await HTTP.request(
+            method, f"{GITHUB_API}{path}", headers=self._api_headers, json=json
+        )
+        response.raise_for_status()
+        return response
+
+    async def clone_repository(self, repo_name: str, work_dir: Path) -> bool:
         """Clone existing repository"""
         try:
-            repo_url = f"https://{self.token}@github.com/{self.username}/{repo_name}.git"
-            subprocess.run(
-                ["git", "clone", repo_url, str(work_dir)],
-                check=True,
-                capture_output=True
+            repo_url = f"https://github.com/{self.username}/{repo_name}.git"
+            # Only the latest tree is needed; skip history and large blobs
+            await _run(
+                [
+                    GIT,
+                    "clone",
+                    "--depth=1",
+                    f"--filter=blob:limit={CLONE_BLOB_LIMIT}",
+                    "--no-checkout",
+                    "--single-branch",
+                    repo_url,
+                    str(work_dir),
+                ],
+                env=self._git_env,
+            )
+
+            # Check out every file the filter fetched, at any depth. Blobs it left
+            # behind show up as ?<oid>; asking for their size would fetch them
+            tree, objects = await asyncio.gather(
+                _run([GIT, "ls-tree", "-r", "-z", "HEAD"], cwd=work_dir),
+                _run([GIT, "rev-list", "--objects", "--missing=print", "HEAD"], cwd=work_dir),
             )
+            missing = {
+                line[1:] for line in objects.stdout.splitlines() if line.startswith(b"?")
+            }
+            patterns = []
+            for record in tree.stdout.split(b"\0"):
+                if not record:
+                    continue
+                meta, path = record.split(b"\t", 1)
+                _, kind, oid = meta.split()
+                if kind == b"blob" and oid not in missing and b"\n" not in path:
+                    patterns.append(b"/" + _SPARSE_SPECIAL.sub(rb"\\\g<0>", path) + b"\n")
+            await _run(
+                [GIT, "sparse-checkout", "set", "--no-cone", "--stdin"],
+                cwd=work_dir,
+                input=b"".join(patterns),
+            )
+            await _run([GIT, "read-tree", "-mu", "HEAD"], cwd=work_dir, env=self._git_env)
             return True
         except subprocess.CalledProcessError:
             return False
 
-    def read_repository_files(self, work_dir: Path) -> dict:
+    async def read_repository_files(self, work_dir: Path) -> dict:
         """Read all files from repository"""
         files = {}
-        for file_path in work_dir.rglob("*"):
-            if file_path.is_file() and not any(
-                part.startswith(".git") for part in file_path.parts
-            ):
-                rel_path = file_path.relative_to(work_dir)
-                try:
-                    # Try to read as text
-                    content = file_path.read_text(encoding="utf-8")
-                    files[str(rel_path)] = content
-                except UnicodeDecodeError:
-                    # Binary file, skip or handle differently
-                    pass
-        return files
 
-    def update_repository(self, work_dir: Path, commit_message: str) -> str:
-        """Update repository with changes"""
+        # List tracked blobs from the index instead of walking the tree; -t tags
+        # entries left out of the sparse checkout (over CLONE_BLOB_LIMIT) with S
+        listing = await _run([GIT, "ls-files", "-z", "-t", "--stage"], cwd=work_dir)
+        entries = []
+        for record in listing.stdout.split(b"\0"):
+            if not record:
+                continue
+            meta, path = record.split(b"\t", 1)
+            tag, _, oid, _ = meta.split()
+            # Blobs outside the sparse checkout were never fetched; reading them
+            # would trigger a lazy fetch per object
+            if tag == b"S":
+                continue
+            rel_path = path.decode("utf-8")
+            # Same filter as any(part.startswith(".git")) over the posix path parts
+            if rel_path.startswith(".git") or "/.git" in rel_path:
+                continue
+            entries.append((oid, rel_path))
 
-        # Configure git 
-        subprocess.run(
-            ["git", "config", "user.name", self.username],
-            cwd=work_dir,
-            check=True,
-        )
-        subprocess.run(
-            ["git", "config", "user.email", f"{self.username}@ds.study.iitm.ac.in"],
-            cwd=work_dir,
-            check=True,
-        )
+        if not entries:
+            return files
 
-        # Add all changes
-        subprocess.run(["git", "add", "."], cwd=work_dir, check=True)
-        
-        # Check if there are changes to commit
-        result = subprocess.run(
-            ["git", "diff", "--staged", "--quiet"],
+        # Fetch every blob through one cat-file process
+        batch = await _run(
+            [GIT, "cat-file", "--batch"],
             cwd=work_dir,
-            capture_output=True
+            input=b"".join(oid + b"\n" for oid, _ in entries),
         )
-        
-        if result.returncode != 0:  # There are changes
-            subprocess.run(
-                ["git", "commit", "-m", commit_message],
-                cwd=work_dir,
-                check=True,
-            )
-            
-            # Push changes
-            subprocess.run(
-                ["git", "push", "origin", "main"],
-                cwd=work_dir,
-                check=True,
-            )
+        out = batch.stdout
+        pos = 0
+        for _, rel_path in entries:
+            header_end = out.index(b"\n", pos)
+            header = out[pos:header_end].split()
+            pos = header_end + 1
+            if header[-1] == b"missing":
+                continue
+            size = int(header[2])
+            data = out[pos:pos + size]
+            pos += size + 1
+            # Skip non-blobs and NUL-containing binaries without a failed decode
+            if header[1] != b"blob" or b"\0" in data[:8192]:
+                continue
+            try:
+                # Try to read as text
+                files[rel_path] = data.decode("utf-8")
+            except UnicodeDecodeError:
+                # Binary file, skip or handle differently
+                pass
+        return files
 
-        # Get commit SHA
-        result = subprocess.run(
-            ["git", "rev-parse", "HEAD"],
-            cwd=work_dir,
-            capture_output=True,
-            text=True,
-            check=True,
+    async def write_repository_files(self, work_dir: Path, files: dict):
+        """Write files into repository in parallel"""
+
+        def write_one(item):
+            filename, content = item
+            file_path = work_dir / filename
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            file_path.write_text(content, encoding="utf-8")
+
+        await asyncio.gather(*(asyncio.to_thread(write_one, item) for item in files.items()))
+
+    async def update_repository(self, work_dir: Path, commit_message: str) -> str:
+        """Update repository with changes"""
+
+        # Stage, commit and push in a single shell invocation
+        cmd = (
+            # --sparse so files written over skipped large paths still get staged
+            f"{GIT_SH} add --sparse ."
+            # Only commit and push when something is staged
+            f" && {{ {GIT_SH} diff --staged --quiet || {{ {GIT_SH} {self._identity} commit -q -m {shlex.quote(commit_message)} && {GIT_SH} push -q origin main; }}; }}"
         )
-        commit_sha = result.stdout.strip()
+        await _run(cmd, cwd=work_dir, env=self._git_env)
+        commit_sha = _read_head_sha(work_dir)
         return commit_sha
 
-    def create_repository(self, repo_name: str, work_dir: Path) -> tuple[str, str]:
-        """Create GitHub repo and push code"""
+    async def init_repository(self, work_dir: Path):
+        """Initialise an empty local repository on main"""
 
-        try:
-            subprocess.run(["git", "init"], cwd=work_dir, check=True, capture_output=True)
-            
-            subprocess.run(
-                ["git", "config", "user.name", self.username],
-                cwd=work_dir,
-                check=True,
-                capture_output=True
-            )
-            subprocess.run(
-                ["git", "config", "user.email", f"{self.username}@ds.study.iitm.ac.in"],
-                cwd=work_dir,
-                check=True,
-                capture_output=True
-            )
+        await _run([GIT, "init", "-q", "--initial-branch=main"], cwd=work_dir)
 
-            subprocess.run(["git", "branch", "-M", "main"], cwd=work_dir, check=True, capture_output=True)
-            subprocess.run(["git", "add", "."], cwd=work_dir, check=True, capture_output=True)
-            subprocess.run(
-                ["git", "commit", "-m", "Initial commit"],
-                cwd=work_dir,
-                check=True,
-                capture_output=True
-            )
+    async def create_repository(self, repo_name: str, work_dir: Path) -> tuple[str, str]:
+        """Create GitHub repo and push code"""
 
-            env = os.environ.copy()
-            env["GH_TOKEN"] = self.token
+        try:
+            # Callers may have initialised the repository ahead of time
+            if not (work_dir / ".git").exists():
+                await self.init_repository(work_dir)
 
-            subprocess.run(
-                ["gh", "repo", "create", repo_name, "--public", "--source=.", "--remote=origin", "--push"],
-                cwd=work_dir,
-                env=env,
-                check=True,
-                capture_output=True,
-                text=True
-            )
+            # The local commit and the remote repository creation are independent
+            tasks = [
+                asyncio.create_task(_run(
+                    f"{GIT_SH} add . && {GIT_SH} {self._identity} commit -q -m 'Initial commit'",
+                    cwd=work_dir,
+                )),
+                asyncio.create_task(
+                    self._gh_api("POST", "/user/repos", json={"name": repo_name, "private": False})
+                ),
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                # Don't leave the other side running against a work dir that is
+                # about to be removed
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
 
-            result = subprocess.run(
-                ["git", "rev-parse", "HEAD"],
-                cwd=work_dir,
-                capture_output=True,
-                text=True,
-                check=True,
-            )
-            commit_sha = result.stdout.strip()
+            remote_url = f"https://github.com/{self.username}/{repo_name}.git"
+            await _run([GIT, "remote", "add", "origin", remote_url], cwd=work_dir)
+            await _run([GIT, "push", "-q", "-u", "origin", "main"], cwd=work_dir, env=self._git_env)
+            commit_sha = _read_head_sha(work_dir)
 
             repo_url = f"https://github.com/{self.username}/{repo_name}"
             return repo_url, commit_sha
             
         except subprocess.CalledProcessError as e:
-            stderr = e.stderr.decode() if hasattr(e, 'stderr') and e.stderr else str(e)
+            # Never echo e.cmd; report git's own output or the exit status
+            stderr = e.stderr.decode() if e.stderr else f"exit status {e.returncode}"
             error_msg = f"Git/GitHub operation failed: {stderr}"
-            print(f"ERROR: {error_msg}")
+            log.error("ERROR: %s", error_msg)
+            raise RuntimeError(error_msg)
+        except httpx.HTTPStatusError as e:
+            error_msg = f"GitHub API request failed: {e.response.status_code} {e.response.text}"
+            log.error("ERROR: %s", error_msg)
             raise RuntimeError(error_msg)
         except FileNotFoundError as e:
-            error_msg = f"Command not found: {e.filename}. Ensure git and gh are installed."
-            print(f"ERROR: {error_msg}")
+            error_msg = f"Command not found: {e.filename}. Ensure git is installed."
+            log.error("ERROR: %s", error_msg)
             raise RuntimeError(error_msg)
 
-    def enable_pages(self, repo_name: str) -> str:
+    async def enable_pages(self, repo_name: str) -> str:
         """Enable GitHub Pages for repository"""
 
-        env = os.environ.copy()
-        env["GH_TOKEN"] = self.token
-
-        # Enable Pages using gh CLI
-        subprocess.run(
-            [
-                "gh",
-                "api",
-                f"repos/{self.username}/{repo_name}/pages",
-                "-X",
-                "POST",
-                "-f",
-                "source[branch]=main",
-                "-f",
-                "source[path]=/",
-            ],
-            env=env,
-            check=True,
+        # Enable Pages through the REST API
+        await self._gh_api(
+            "POST",
+            f"/repos/{self.username}/{repo_name}/pages",
+            json={"source": {"branch": "main", "path": "/"}},
         )
 
         pages_url = f"https://{self.username}.github.io/{repo_name}/"
@@ -182,20 +307,36 @@ class GitHubDeployer:
     async def wait_for_pages(self, pages_url: str, max_wait: int = 300):
         """Wait for GitHub Pages to be available"""
 
-        async with httpx.AsyncClient() as client:
-            for i in range(max_wait // 10):
-                try:
-                    response = await client.get(pages_url, timeout=10)
-                    if response.status_code == 200:
-                        print(f"✅ Pages deployed successfully")
-                        return True
-                except Exception:
-                    pass
+        elapsed = 0
+        next_log = 0
+        consecutive_errors = 0
+        attempt = 0
+        while elapsed < max_wait:
+            try:
+                # Only the status code matters, so skip downloading the page body
+                response = await HTTP.head(pages_url, follow_redirects=True, timeout=10)
+                if response.status_code == 200:
+                    log.info("✅ Pages deployed successfully")
+                    return True
+                consecutive_errors = 0
+            except Exception:
+                consecutive_errors += 1
 
-                if i % 3 == 0:  # Log every 30 seconds
-                    print(f"⏳ Waiting for Pages deployment... ({i*10}s)")
+            if elapsed >= next_log:  # Log every 30 seconds
+                log.info("⏳ Waiting for Pages deployment... (%ds)", elapsed)
+                next_log = elapsed + 30
 
-                await asyncio.sleep(10)
+            if consecutive_errors:
+                # Back off while the endpoint is unreachable
+                delay = min(60, 10 * 1.5**consecutive_errors)
+            elif attempt < len(PAGES_POLL_INTERVALS):
+                # Pages often goes live within seconds, so poll eagerly at first
+                delay = PAGES_POLL_INTERVALS[attempt]
+            else:
+                delay = 10
+            attempt += 1
+            await asyncio.sleep(delay)
+            elapsed += delay
 
-        print(f"⚠ Pages deployment timeout after {max_wait}s")
+        log.warning("⚠ Pages deployment timeout after %ds", max_wait)
         return False
\ No newline at end of file
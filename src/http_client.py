@@ -0,0 +1,9 @@
+import httpx
+
+# Shared client so evaluation retries, Pages polls and GitHub API calls reuse
+# pooled keep-alive connections (multiplexed over HTTP/2 where the server supports it)
+HTTP = httpx.AsyncClient(
+    http2=True,
+    timeout=30,
+    limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=30),
+)
@@ -1,13 +1,28 @@
-from src.utils import extract_json_from_llm_response
+from src.utils import DataAttachment, extract_json_from_llm_response
 from src.prompts import round_1_prompt, round_2_prompt
 from typing import List, Optional
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent
-import json
+from cachetools import LRUCache
+import hashlib
+import logging
 import os
 
+try:
+    import orjson
+
+    def _dumps_indented(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+except ImportError:
+    import json
+
+    def _dumps_indented(obj) -> str:
+        return json.dumps(obj, indent=2)
+
 MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "gemini")  
 
+log = logging.getLogger(__name__)
+
 class Attachment(BaseModel):
     name: str
     url: str
@@ -23,38 +38,54 @@ class DeploymentRequest(BaseModel):
     evaluation_url: str
     attachments: Optional[List[Attachment]] = []
 
+CONTEXT_SKIP_FILES = {"LICENSE", ".nojekyll", ".gitattributes"}
+CONTEXT_SOURCE_EXTENSIONS = (".html", ".htm", ".css", ".js", ".md")
+CONTEXT_DATA_EXTENSIONS = (".png", ".jpg", ".jpeg", ".gif", ".pdf", ".csv", ".json")
+CONTEXT_MAX_INLINE_CHARS = 4000
+
+
+def _is_data_file(filename: str, content: str) -> bool:
+    """Whether a file should be summarized rather than inlined in the prompt"""
+    if filename.endswith(CONTEXT_SOURCE_EXTENSIONS):
+        return False
+    return filename.endswith(CONTEXT_DATA_EXTENSIONS) or len(content) > CONTEXT_MAX_INLINE_CHARS
+
+
+# Parsed LLM outputs keyed by prompt digest; shared across CodeGenerator instances
+_RESPONSE_CACHE = LRUCache(maxsize=128)
+
+
+def _prompt_cache_key(model: str, prompt: str) -> str:
+    return hashlib.blake2b(f"{model}\0{prompt}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _build_attachment_info(attachments: List[DataAttachment]) -> list:
+    """Summarize data-URL attachments for the prompt"""
+    return [
+        {"name": att.name, "type": att.mime, "size": f"{att.size} bytes"}
+        for att in attachments
+    ]
+
 class CodeGenerator:
     """Handles LLM-based code generation using Gemini"""
 
     def __init__(self):
         if MODEL_PROVIDER == "openai":
             self.model = "openai:gpt-5-nano"
-            print("🤖 Using OpenAI model")
+            log.info("🤖 Using OpenAI model")
         else: 
             self.model = "gemini-2.0-flash-exp"
-            print("🤖 Using Gemini model")
+            log.info("🤖 Using Gemini model")
 
         self.agent = Agent(self.model)
 
     async def generate_project(
-        self, brief: str, checks: List[str], attachments: List[Attachment]
+        self, brief: str, checks: List[str], attachments: List[DataAttachment]
     ) -> dict:
         """Generate complete project files based on brief"""
 
         # Process attachments
-        attachment_info = []
-        for att in attachments:
-            if att.url.startswith("data:"):
-                # Extract base64 data
-                parts = att.url.split(",", 1)
-                if len(parts) == 2:
-                    attachment_info.append(
-                        {
-                            "name": att.name,
-                            "type": parts[0].split(";")[0].split(":")[1],
-                            "size": f"{len(parts[1])} chars (base64)",
-                        }
-                    )
+        attachment_info = _build_attachment_info(attachments)
 
         prompt = f"""You are a senior full-stack web developer creating a production-ready static web application for GitHub Pages deployment with automated DOM-based testing.
                 
@@ -73,15 +104,21 @@ class CodeGenerator:
         • No mocked or fake implementations—everything must actually work
 
         === ATTACHMENTS ===
-        {json.dumps(attachment_info, indent=2) if attachment_info else "No attachments"}
+        {_dumps_indented(attachment_info) if attachment_info else "No attachments"}
 
         {round_1_prompt}"""
       
+        # Identical prompts (e.g. retried requests) reuse the earlier output
+        cache_key = _prompt_cache_key(self.model, prompt)
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            log.info("♻ Reusing cached LLM output (%d files)", len(cached))
+            return dict(cached)
+
         result = await self.agent.run(prompt)
         response_text = result.output.strip() 
         
-        print(f"📄 LLM Response length: {len(response_text)} chars")
-        print(f"📄 First 100 chars: {response_text[:100]}")
+        log.info("📄 LLM Response length: %d chars, first 100: %r", len(response_text), response_text[:100])
         
         # Use robust JSON extraction
         try:
@@ -91,42 +128,41 @@ class CodeGenerator:
             if "index.html" not in files or "README.md" not in files:
                 raise ValueError(f"Missing required files. Got keys: {list(files.keys())}")
             
-            print(f"✅ Successfully parsed {len(files)} files")
+            log.info("✅ Successfully parsed %d files", len(files))
+            _RESPONSE_CACHE[cache_key] = dict(files)
             return files
             
         except Exception as e:
-            print(f"❌ JSON parsing failed: {str(e)}")
+            log.error("❌ JSON parsing failed: %s", e)
             raise
 
     async def improve_project(
         self, 
         brief: str, 
         checks: List[str], 
-        attachments: List[Attachment],
+        attachments: List[DataAttachment],
         existing_files: dict
     ) -> dict:
         """Improve existing project files based on new brief"""
 
         # Process attachments
-        attachment_info = []
-        for att in attachments:
-            if att.url.startswith("data:"):
-                parts = att.url.split(",", 1)
-                if len(parts) == 2:
-                    attachment_info.append(
-                        {
-                            "name": att.name,
-                            "type": parts[0].split(";")[0].split(":")[1],
-                            "size": f"{len(parts[1])} chars (base64)"
-                        }
-                    )
-
-        # Build existing code context
-        existing_code = "\n\n".join([
-            f"=== {filename} ===\n{content}" 
-            for filename, content in existing_files.items()
-            if filename not in ['LICENSE', '.nojekyll', '.gitattributes']
-        ])
+        attachment_info = _build_attachment_info(attachments)
+
+        # Build existing code context in one pass
+        buf = []
+        for filename, content in existing_files.items():
+            if filename in CONTEXT_SKIP_FILES:
+                continue
+            if _is_data_file(filename, content):
+                # Data and asset files only need a manifest entry, not their full body
+                data = content.encode("utf-8")
+                digest = hashlib.sha256(data).hexdigest()[:8]
+                buf.append(f"=== {filename} === [data file, {len(data)} bytes, sha256={digest}]\n\n")
+                continue
+            buf.append(f"=== {filename} ===\n")
+            buf.append(content)
+            buf.append("\n\n")
+        existing_code = "".join(buf)
 
         prompt = f"""You are a senior full-stack web developer upgrading an existing static web application deployed on GitHub Pages.
 
@@ -148,14 +184,21 @@ class CodeGenerator:
         • Backward compatibility with existing features
 
         === NEW ATTACHMENTS ===
-        {json.dumps(attachment_info, indent=2) if attachment_info else "No new attachments"}
+        {_dumps_indented(attachment_info) if attachment_info else "No new attachments"}
 
         {round_2_prompt}"""
         
+        # Identical prompts (e.g. retried requests) reuse the earlier output
+        cache_key = _prompt_cache_key(self.model, prompt)
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            log.info("♻ Reusing cached LLM output (%d files)", len(cached))
+            return dict(cached)
+
         result = await self.agent.run(prompt)
         response_text = result.output.strip() 
 
-        print(f"📄 LLM Response length: {len(response_text)} chars")
+        log.info("📄 LLM Response length: %d chars", len(response_text))
         
         # Use robust JSON extraction
         try:
@@ -164,9 +207,10 @@ class CodeGenerator:
             if "index.html" not in files or "README.md" not in files:
                 raise ValueError(f"Missing required files. Got keys: {list(files.keys())}")
             
-            print(f"✅ Successfully parsed {len(files)} files")
+            log.info("✅ Successfully parsed %d files", len(files))
+            _RESPONSE_CACHE[cache_key] = dict(files)
             return files
             
         except Exception as e:
-            print(f"❌ JSON parsing failed: {str(e)}")
+            log.error("❌ JSON parsing failed: %s", e)
             raise
\ No newline at end of file
@@ -1,6 +1,7 @@
 import asyncio
-import base64
+import binascii
 import json
+import logging
 import os
 import re
 import subprocess
@@ -12,19 +13,29 @@ from pathlib import Path
 from typing import List, Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent
 from dotenv import load_dotenv
 
 from src.prompts import MIT_LICENSE, round_1_prompt, round_2_prompt
-from src.utils import extract_json_from_llm_response, check_system_dependencies
+from src.utils import (
+    DataAttachment,
+    check_system_dependencies,
+    extract_json_from_llm_response,
+    parse_attachments,
+    setup_logging,
+)
 from src.github import GitHubDeployer
 from src.evaluation import submit_evaluation
 from src.llm import CodeGenerator
+from src.http_client import HTTP
 
 load_dotenv()
 
+log_listener = setup_logging()
+log = logging.getLogger(__name__)
+
 # Environment Configuration
 SECRET_KEY = os.getenv("SECRET_KEY")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
@@ -35,6 +46,28 @@ GITHUB_USERNAME = os.getenv("GITHUB_USERNAME")
 
 MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "gemini")  
 
+# Work directories are short-lived, so keep them on tmpfs when available
+TEMPDIR = os.getenv("DEPLOYX_TMPDIR", "/dev/shm")
+if not os.path.isdir(TEMPDIR):
+    TEMPDIR = None
+# Attachments land twice (working tree + git object) next to the generated site and
+# git metadata; Docker's default 64 MiB /dev/shm covers this for typical payloads
+TEMPDIR_HEADROOM = 4 << 20
+_tempdir_skip_logged = False
+
+# Deployments are queued and run by a fixed pool of workers on the event loop
+DEPLOY_WORKERS = int(os.getenv("DEPLOYX_WORKERS", "4"))
+# How long shutdown waits for queued and running deployments to finish
+DEPLOY_DRAIN_TIMEOUT = float(os.getenv("DEPLOYX_DRAIN_TIMEOUT", "600"))
+deployment_queue: asyncio.Queue = asyncio.Queue()
+deployment_workers: List[asyncio.Task] = []
+accepting_deployments = True
+
+GITATTRIBUTES = (
+    "* text=auto\n*.png binary\n*.jpg binary\n*.jpeg binary\n"
+    "*.gif binary\n*.ico binary\n*.pdf binary\n*.svg binary\n"
+)
+
 app = FastAPI(title="LLM Code Deployment Server")
 
 
@@ -60,34 +93,65 @@ app = FastAPI(title="LLM Code Deployment Server")
 @app.on_event("startup")
 async def startup_event():
     """Validate environment on startup"""
-    print("Starting LLM Deployment Server...")
+    log.info("Starting LLM Deployment Server...")
     
     # Check system dependencies
     try:
         check_system_dependencies()
-        print("✓ System dependencies OK (git, gh)")
+        log.info("✓ System dependencies OK (git)")
     except RuntimeError as e:
-        print(f"✗ System dependency check failed:\n{e}")
-        print("⚠ Server will start but deployments will fail!")
+        log.error("✗ System dependency check failed:\n%s", e)
+        log.warning("⚠ Server will start but deployments will fail!")
 
     # Check environment variables
-    print(f"📊 Model Provider: {MODEL_PROVIDER}")
+    log.info("📊 Model Provider: %s", MODEL_PROVIDER)
 
     if not SECRET_KEY:
-        print("⚠ WARNING: SECRET_KEY not set")
+        log.warning("⚠ WARNING: SECRET_KEY not set")
     if MODEL_PROVIDER == "gemini" and not GOOGLE_API_KEY:
-        print("⚠ WARNING: GOOGLE_API_KEY not set (required for Gemini)")
+        log.warning("⚠ WARNING: GOOGLE_API_KEY not set (required for Gemini)")
     if MODEL_PROVIDER == "openai" and not OPENAI_API_KEY and not OPENAI_BASE_URL:
-        print("⚠ WARNING: OPENAI_API_KEY not set (required for OpenAI)")
+        log.warning("⚠ WARNING: OPENAI_API_KEY not set (required for OpenAI)")
     if not GITHUB_TOKEN:
-        print("⚠ WARNING: GITHUB_TOKEN not set")
+        log.warning("⚠ WARNING: GITHUB_TOKEN not set")
     if not GITHUB_USERNAME:
-        print("⚠ WARNING: GITHUB_USERNAME not set")
+        log.warning("⚠ WARNING: GITHUB_USERNAME not set")
     
     if all([SECRET_KEY, GITHUB_TOKEN, GITHUB_USERNAME]):
-        print("✓ Core environment variables configured")
+        log.info("✓ Core environment variables configured")
     
-    print("✅ Server ready!")
+    # Start the deployment worker pool
+    for _ in range(DEPLOY_WORKERS):
+        deployment_workers.append(asyncio.create_task(deployment_worker()))
+    log.info("✓ %d deployment workers started", DEPLOY_WORKERS)
+
+    log.info("✅ Server ready!")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Drain deployment workers, release pooled HTTP connections and flush queued logs"""
+    global accepting_deployments
+    accepting_deployments = False
+
+    # Let queued and running deployments finish before stopping the workers
+    try:
+        await asyncio.wait_for(deployment_queue.join(), DEPLOY_DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        log.error("⚠ Deployment queue not drained after %gs", DEPLOY_DRAIN_TIMEOUT)
+        while not deployment_queue.empty():
+            request = deployment_queue.get_nowait()
+            log.error(
+                "✗ Dropping queued deployment for task %s (round %d, nonce %s)",
+                request.task, request.round, request.nonce,
+            )
+            deployment_queue.task_done()
+
+    for task in deployment_workers:
+        task.cancel()
+    await asyncio.gather(*deployment_workers, return_exceptions=True)
+    await HTTP.aclose()
+    log_listener.stop()
 
 
 # Request Models
@@ -518,16 +582,48 @@ class EvaluationResponse(BaseModel):
 #     return False
 
 
+def _write_data_url(path: Path, url: str, offset: int, chunk: int = 1 << 16):
+    """Stream-decode a base64 data-URL payload to disk in 4-aligned chunks"""
+    with open(path, "wb") as f:
+        for i in range(offset, len(url), chunk):
+            f.write(binascii.a2b_base64(url[i:i + chunk]))
+
+
+async def write_attachments(work_dir: Path, attachments: List[DataAttachment]):
+    """Write data-URL attachments into work_dir concurrently"""
+    await asyncio.gather(
+        *(
+            asyncio.to_thread(_write_data_url, work_dir / att.name, att.url, att.offset)
+            for att in attachments
+        )
+    )
+
+
+def _temp_root(payload_size: int) -> Optional[str]:
+    """tmpfs root for a work directory, or None (system default) when it is too full"""
+    global _tempdir_skip_logged
+    if not TEMPDIR:
+        return None
+    free = shutil.disk_usage(TEMPDIR).free
+    if free > 2 * payload_size + TEMPDIR_HEADROOM:
+        return TEMPDIR
+    if not _tempdir_skip_logged:
+        log.warning(
+            "⚠ %s has %d bytes free, too little for a %d-byte payload; using the default temp dir",
+            TEMPDIR, free, payload_size,
+        )
+        _tempdir_skip_logged = True
+    return None
+
+
 async def process_deployment(request: DeploymentRequest):
     """Main deployment workflow"""
 
     try:
-        print(f"\n{'='*60}")
-        print(f"📦 Starting deployment")
-        print(f"   Task: {request.task}")
-        print(f"   Round: {request.round}")
-        print(f"   Checks: {len(request.checks)}")
-        print(f"{'='*60}\n")
+        log.info(
+            "\n%s\n📦 Starting deployment\n   Task: %s\n   Round: %d\n   Checks: %d\n%s\n",
+            "=" * 60, request.task, request.round, len(request.checks), "=" * 60,
+        )
 
         repo_name = f"{request.task}-{request.nonce}".replace(" ", "-")
         
@@ -536,64 +632,78 @@ async def process_deployment(request: DeploymentRequest):
         else:
             await process_round_2(request, repo_name)
 
+    except asyncio.CancelledError:
+        log.error("Deployment cancelled for task %s (round %d)", request.task, request.round)
+        raise
     except Exception as e:
-        print(f"Deployment failed for task {request.task}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Deployment failed for task %s: %s", request.task, e)
         raise
 
 
+async def deployment_worker():
+    """Run queued deployments one at a time"""
+    while True:
+        request = await deployment_queue.get()
+        try:
+            await process_deployment(request)
+        except Exception:
+            # Already reported by process_deployment; keep the worker alive
+            pass
+        finally:
+            deployment_queue.task_done()
+
+
 async def process_round_1(request: DeploymentRequest, repo_name: str):
     """Process Round 1: Create new repository"""
     
     try:
-        print(f"Round 1: Creating new repository {repo_name}")
+        log.info("Round 1: Creating new repository %s", repo_name)
 
         generator = CodeGenerator()
-        files = await generator.generate_project(
-            request.brief, request.checks, request.attachments
-        )
+        deployer = GitHubDeployer(GITHUB_USERNAME, GITHUB_TOKEN)
+        attachments = parse_attachments(request.attachments)
+        temp_root = _temp_root(sum(att.size for att in attachments))
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
+        with tempfile.TemporaryDirectory(dir=temp_root) as tmp_dir:
             work_dir = Path(tmp_dir)
 
-            # Write generated files
-            for filename, content in files.items():
-                file_path = work_dir / filename
-                file_path.write_text(content, encoding="utf-8")
-                print(f"   ✓ Created {filename} ({len(content)} chars)")
-
-            # Add MIT License
-            license_path = work_dir / "LICENSE"
-            license_path.write_text(MIT_LICENSE.format(year=datetime.now().year), encoding="utf-8")
-
-            # Add .nojekyll
-            (work_dir / ".nojekyll").touch()
-
-            # Add .gitattributes
-            (work_dir / ".gitattributes").write_text(
-                "* text=auto\n*.png binary\n*.jpg binary\n*.jpeg binary\n"
-                "*.gif binary\n*.ico binary\n*.pdf binary\n*.svg binary\n",
-                encoding="utf-8"
+            # MIT License, .nojekyll and .gitattributes don't depend on the LLM output
+            static_files = {
+                "LICENSE": MIT_LICENSE.format(year=datetime.now().year),
+                ".nojekyll": "",
+                ".gitattributes": GITATTRIBUTES,
+            }
+
+            # Initialise the repository and write static files while the LLM is generating
+            prep = asyncio.gather(
+                deployer.init_repository(work_dir),
+                deployer.write_repository_files(work_dir, static_files),
             )
+            try:
+                files = await generator.generate_project(
+                    request.brief, request.checks, attachments
+                )
+            finally:
+                await prep
+
+            # Write generated files; the static files above take precedence
+            files = {name: content for name, content in files.items() if name not in static_files}
+            await deployer.write_repository_files(work_dir, files)
+            for filename, content in files.items():
+                log.info("   ✓ Created %s (%d chars)", filename, len(content))
 
             # Process attachments
-            for att in request.attachments:
-                if att.url.startswith("data:"):
-                    parts = att.url.split(",", 1)
-                    if len(parts) == 2:
-                        data = base64.b64decode(parts[1])
-                        (work_dir / att.name).write_bytes(data)
-                        print(f"   ✓ Saved attachment {att.name}")
+            await write_attachments(work_dir, attachments)
+            for att in attachments:
+                log.info("   ✓ Saved attachment %s", att.name)
 
             # Deploy to GitHub
-            deployer = GitHubDeployer(GITHUB_USERNAME, GITHUB_TOKEN)
-            repo_url, commit_sha = deployer.create_repository(repo_name, work_dir)
-            print(f"✅ Repository: {repo_url}")
+            repo_url, commit_sha = await deployer.create_repository(repo_name, work_dir)
+            log.info("✅ Repository: %s", repo_url)
 
             # Enable GitHub Pages
-            pages_url = deployer.enable_pages(repo_name)
-            print(f"✅ Pages URL: {pages_url}")
+            pages_url = await deployer.enable_pages(repo_name)
+            log.info("✅ Pages URL: %s", pages_url)
 
             # Wait for Pages
             await deployer.wait_for_pages(pages_url)
@@ -612,7 +722,7 @@ async def process_round_1(request: DeploymentRequest, repo_name: str):
         await submit_evaluation(request.evaluation_url, evaluation)
 
     except Exception as e:
-        print(f"Round 1 deployment failed: {str(e)}")
+        log.error("Round 1 deployment failed: %s", e)
         raise
 
 
@@ -620,47 +730,43 @@ async def process_round_2(request: DeploymentRequest, repo_name: str):
     """Process Round 2+: Update existing repository"""
     
     try:
-        print(f"Round {request.round}: Updating existing repository {repo_name}")
+        log.info("Round %d: Updating existing repository %s", request.round, repo_name)
+
+        attachments = parse_attachments(request.attachments)
+        temp_root = _temp_root(sum(att.size for att in attachments))
 
-        with tempfile.TemporaryDirectory() as tmp_dir:
+        with tempfile.TemporaryDirectory(dir=temp_root) as tmp_dir:
             work_dir = Path(tmp_dir) / repo_name
             work_dir.mkdir(parents=True)
 
             deployer = GitHubDeployer(GITHUB_USERNAME, GITHUB_TOKEN)
-            cloned = deployer.clone_repository(repo_name, work_dir)
+            cloned = await deployer.clone_repository(repo_name, work_dir)
             
             if not cloned:
                 raise Exception(f"Repository {repo_name} not found. Cannot process round 2.")
 
-            print(f"   ✓ Cloned repository")
+            log.info("   ✓ Cloned repository")
 
-            existing_files = deployer.read_repository_files(work_dir)
-            print(f"   ✓ Read {len(existing_files)} existing files")
+            existing_files = await deployer.read_repository_files(work_dir)
+            log.info("   ✓ Read %d existing files", len(existing_files))
 
             generator = CodeGenerator()
             updated_files = await generator.improve_project(
-                request.brief, request.checks, request.attachments, existing_files
+                request.brief, request.checks, attachments, existing_files
             )
 
             # Write updated files
-            for filename, content in updated_files.items():
-                file_path = work_dir / filename
-                file_path.parent.mkdir(parents=True, exist_ok=True)
-                file_path.write_text(content, encoding="utf-8")
-                print(f"   ✓ Updated {filename}")
+            await deployer.write_repository_files(work_dir, updated_files)
+            for filename in updated_files:
+                log.info("   ✓ Updated %s", filename)
 
             # Process new attachments
-            for att in request.attachments:
-                if att.url.startswith("data:"):
-                    parts = att.url.split(",", 1)
-                    if len(parts) == 2:
-                        data = base64.b64decode(parts[1])
-                        (work_dir / att.name).write_bytes(data)
+            await write_attachments(work_dir, attachments)
 
             # Commit and push
             commit_message = f"Round {request.round}: {int(time.time())}"
-            commit_sha = deployer.update_repository(work_dir, commit_message)
-            print(f"✅ Committed: {commit_sha[:8]}")
+            commit_sha = await deployer.update_repository(work_dir, commit_message)
+            log.info("✅ Committed: %.8s", commit_sha)
 
             repo_url = f"https://github.com/{GITHUB_USERNAME}/{repo_name}"
             pages_url = f"https://{GITHUB_USERNAME}.github.io/{repo_name}/"
@@ -682,7 +788,7 @@ async def process_round_2(request: DeploymentRequest, repo_name: str):
         await submit_evaluation(request.evaluation_url, evaluation)
 
     except Exception as e:
-        print(f"Round {request.round} failed: {str(e)}")
+        log.error("Round %d failed: %s", request.round, e)
         raise
 
 
@@ -701,8 +807,8 @@ async def ping_evaluation_url(response: EvaluationResponse):
     return {"status": "accepted", "message": "Evaluation received"}
 
 
-@app.post("/api-endpoint")
-async def deploy_code(request: DeploymentRequest, background_tasks: BackgroundTasks):
+@app.post("/api-endpoint", status_code=202)
+async def deploy_code(request: DeploymentRequest):
     """Main endpoint for code deployment requests"""
 
     # Validate secret key
@@ -713,10 +819,14 @@ async def deploy_code(request: DeploymentRequest, background_tasks: BackgroundTa
     if not all([request.brief, request.evaluation_url, request.task, request.nonce]):
         raise HTTPException(status_code=400, detail="Missing required fields")
 
-    # Add deployment to background tasks
-    background_tasks.add_task(process_deployment, request)
+    # Refuse new work once shutdown has started draining the queue
+    if not accepting_deployments:
+        raise HTTPException(status_code=503, detail="Server is shutting down")
+
+    # Hand the deployment to the worker pool
+    await deployment_queue.put(request)
 
-    # Return immediate 200 response
+    # Return immediate 202 response
     return {"status": "accepted", "message": "Deployment started"}
 
 
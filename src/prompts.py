@@ -21,7 +21,7 @@ OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 SOFTWARE.
 """
 
-round_1_prompt = f"""=== OUTPUT SPECIFICATION ===
+round_1_prompt = """=== OUTPUT SPECIFICATION ===
 
 Generate TWO files only:
 
@@ -55,10 +55,10 @@ Generate TWO files only:
 Return ONLY a valid JSON object with NO markdown, NO code blocks, NO extra text.
 The JSON must be parseable by Python's json.loads().
 
-{{
+{
   "index.html": "<!DOCTYPE html>\\n<html lang=\\"en\\">\\n...",
   "README.md": "# Project Title\\n\\n..."
-}}
+}
 
 **CRITICAL:** 
 • Return PURE JSON only
@@ -71,7 +71,7 @@ The JSON must be parseable by Python's json.loads().
 • The index.html should be 100% complete and deployable
 • Every feature mentioned in the brief must be implemented"""
 
-round_2_prompt = f"""=== UPGRADE OBJECTIVES ===
+round_2_prompt = """=== UPGRADE OBJECTIVES ===
 1. Implement all new features from the brief
 2. Ensure ALL new test checks pass successfully
 3. Maintain ALL existing functionality
@@ -97,10 +97,10 @@ Generate TWO complete files:
 === OUTPUT FORMAT ===
 Return ONLY a valid JSON object with NO markdown, NO code blocks, NO extra text.
 
-{{
+{
   "index.html": "<!DOCTYPE html>...",
   "README.md": "# Project Title\\n\\n## Version 2.0.0..."
-}}
+}
 
 **CRITICAL:**
 • Return PURE JSON only
@@ -1,7 +1,81 @@
-import json
+import copy
+import hashlib
+import json  # orjson.JSONDecodeError subclasses json.JSONDecodeError
+import logging
+import queue
 import re
 import time
 import shutil
+import sys
+from dataclasses import dataclass
+from logging.handlers import QueueHandler, QueueListener
+
+from cachetools import LRUCache
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+log = logging.getLogger(__name__)
+
+_PARSE_CACHE = LRUCache(maxsize=64)
+# Openers tried after an unclosed { before giving up on the balanced scan
+_STRAY_BRACE_RETRIES = 8
+
+# Compiled once; used on every attachment
+_WHITESPACE_RE = re.compile(r'\s')
+
+def setup_logging(level: int = logging.INFO) -> QueueListener:
+    """Route application logs through a queue so stdout writes happen off the event loop"""
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+
+    logger = logging.getLogger("src")
+    logger.addHandler(QueueHandler(log_queue))
+    logger.setLevel(level)
+    logger.propagate = False
+
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+@dataclass
+class DataAttachment:
+    """A data-URL attachment whose base64 payload is decoded only when written"""
+    name: str
+    mime: str
+    url: str
+    offset: int  # start of the base64 payload within url
+    size: int  # decoded size in bytes
+
+def parse_attachments(attachments) -> list[DataAttachment]:
+    """Parse data-URL attachments without copying or decoding their payloads"""
+    parsed = []
+    for att in attachments:
+        if att.url.startswith("data:"):
+            url = att.url
+            comma = url.find(",")
+            if comma == -1:
+                continue
+            header = url[:comma]
+            # Chunked decoding relies on 4-char alignment, so drop any whitespace
+            if _WHITESPACE_RE.search(url, comma):
+                url = header + "," + "".join(url[comma + 1:].split())
+            length = len(url) - comma - 1
+            padding = 2 if url.endswith("==") else 1 if url.endswith("=") else 0
+            parsed.append(
+                DataAttachment(
+                    name=att.name,
+                    mime=header.split(";")[0].split(":")[1],
+                    url=url,
+                    offset=comma + 1,
+                    size=length // 4 * 3 - padding,
+                )
+            )
+    return parsed
 
 def check_system_dependencies():
     """Check if required system dependencies are available"""
@@ -11,21 +85,111 @@ def check_system_dependencies():
     if not shutil.which("git"):
         missing.append("git")
     
-    # Check for gh (GitHub CLI)
-    if not shutil.which("gh"):
-        missing.append("gh")
-    
     if missing:
         raise RuntimeError(
             f"Missing required system dependencies: {', '.join(missing)}\n"
             f"Please install them or use the provided Dockerfile."
         )
     
+def _find_outer_json(text: str) -> str | None:
+    """
+    Return the largest balanced top-level {...} span in a single pass.
+    Braces inside JSON string literals are ignored. An object still open at
+    the end (truncated output, or a stray { in prose) yields no span; callers
+    fall back to brace slicing.
+    """
+    best = None
+    depth = 0
+    start = 0
+    in_string = False
+    escape = False
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            # Quotes only delimit strings inside an object
+            in_string = depth > 0
+        elif ch == "{":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif ch == "}" and depth:
+            depth -= 1
+            if depth == 0 and (best is None or i + 1 - start > best[1] - best[0]):
+                best = (start, i + 1)
+
+    return text[best[0]:best[1]] if best else None
+
+def _decode_after_stray_brace(text: str, start: int) -> dict | None:
+    """
+    Decode an object hidden behind a stray { at start by trying the next few
+    openers. A failure caused by running out of input means the reply was
+    truncated, so give up rather than return a fragment from inside it.
+    Bounded so the cost stays linear in len(text).
+    """
+    decoder = json.JSONDecoder()
+    pos = start
+    for _ in range(_STRAY_BRACE_RETRIES):
+        try:
+            parsed, _ = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError as e:
+            if e.pos >= len(text) or e.msg.startswith("Unterminated string"):
+                return None
+        else:
+            if isinstance(parsed, dict):
+                return parsed
+        pos = text.find('{', pos + 1)
+        if pos == -1:
+            break
+    return None
+
+def _strip_trailing_commas(text: str) -> str:
+    """Drop commas directly before a closing } or ], leaving string literals untouched"""
+    out = []
+    pending = None  # index in out of a comma that may turn out to be trailing
+    in_string = False
+    escape = False
+
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == ",":
+            pending = len(out)
+        elif ch == "}" or ch == "]":
+            if pending is not None:
+                out[pending] = ""
+            pending = None
+        elif not ch.isspace():
+            pending = None
+            in_string = ch == '"'
+        out.append(ch)
+
+    return "".join(out)
+
 def extract_json_from_llm_response(response_text: str) -> dict:
     """
     Robust JSON extraction from LLM responses.
     Handles markdown code blocks, extra text, and malformed JSON.
+    Parsed results are cached by response digest; callers get a copy.
     """
+    key = hashlib.blake2b(response_text.encode("utf-8"), digest_size=16).digest()
+    parsed = _PARSE_CACHE.get(key)
+    if parsed is None:
+        parsed = _PARSE_CACHE[key] = _extract_json(response_text)
+    return copy.copy(parsed)
+
+def _extract_json(response_text: str) -> dict:
     
     # Step 1: Remove markdown code blocks
     response_text = response_text.strip()
@@ -43,51 +207,47 @@ def extract_json_from_llm_response(response_text: str) -> dict:
     
     # Step 2: Try direct JSON parsing
     try:
-        return json.loads(response_text)
+        return _json_loads(response_text)
     except json.JSONDecodeError:
         pass
     
-    # Step 3: Find JSON object using regex (greedy match)
-    # Look for outermost { }
-    json_pattern = r'\{(?:[^{}]|(?:\{[^{}]*\}))*\}'
-    matches = list(re.finditer(json_pattern, response_text, re.DOTALL))
-    
-    if not matches:
-        # Try to find any JSON-like structure
-        start = response_text.find('{')
-        end = response_text.rfind('}')
-        if start != -1 and end != -1 and end > start:
-            response_text = response_text[start:end+1]
-    else:
-        # Use the largest match (usually the complete JSON)
-        largest_match = max(matches, key=lambda m: len(m.group()))
-        response_text = largest_match.group()
+    # Step 3: Fast path - trim surrounding prose to the first { and last }
+    start = response_text.find('{')
+    end = response_text.rfind('}')
+    trimmed = response_text[start:end+1] if start != -1 and end > start else None
+    if trimmed is not None and len(trimmed) < len(response_text):
+        try:
+            return _json_loads(trimmed)
+        except json.JSONDecodeError:
+            pass
     
-    # Step 4: Clean up common issues
-    # Remove any text before first {
-    first_brace = response_text.find('{')
-    if first_brace > 0:
-        response_text = response_text[first_brace:]
+    # Step 4: Find the largest balanced top-level { } (usually the complete JSON)
+    candidate = _find_outer_json(response_text)
     
-    # Remove any text after last }
-    last_brace = response_text.rfind('}')
-    if last_brace != -1:
-        response_text = response_text[:last_brace+1]
+    if candidate is not None:
+        response_text = candidate
+    elif trimmed is not None:
+        # A stray { in leading prose hides the object from the scan
+        parsed = _decode_after_stray_brace(response_text, start)
+        if parsed is not None:
+            return parsed
+        # Unbalanced output; keep the first-to-last brace slice
+        response_text = trimmed
     
     # Step 5: Fix common JSON issues
     # Remove trailing commas before closing braces/brackets
-    response_text = re.sub(r',(\s*[}\]])', r'\1', response_text)
+    response_text = _strip_trailing_commas(response_text)
     
     # Fix unescaped quotes in strings (basic heuristic)
     # This is tricky and may not work for all cases
     
     # Step 6: Try parsing again
     try:
-        return json.loads(response_text)
+        return _json_loads(response_text)
     except json.JSONDecodeError as e:
         # Step 7: Last resort - try to fix specific error
-        print(f"JSON parsing error at position {e.pos}: {e.msg}")
-        print(f"Context: ...{response_text[max(0, e.pos-50):e.pos+50]}...")
+        log.error("JSON parsing error at position %d: %s", e.pos, e.msg)
+        log.error("Context: ...%s...", response_text[max(0, e.pos-50):e.pos+50])
         
         # Save for debugging
         debug_file = f"/tmp/llm_raw_output_{int(time.time())}.txt"